@@ -45,10 +45,10 @@ def log_exception(logger: Logger, exception: BaseException):
     Log an exception to the provided logger. Special handling rules for DDNSWolf custom
     exceptions will be applied.
     """
-    if isinstance(exception, DDNSWolfUserException):
-        logger.error(str(exception))
-    else:
+    if getattr(exception, "print_stack_trace", True):
         logger.error(str(exception), exc_info=exception)
+    else:
+        logger.error(str(exception))
 
 
 class DDNSWolfUserException(Exception):
@@ -57,7 +57,8 @@ class DDNSWolfUserException(Exception):
     a stack trace, rather print only the provided message.
     """
 
-    pass
+    print_stack_trace = False
+    """Read by log_exception(). Exceptions without this attribute print a trace."""
 
 
 class DDNSWolfProgramException(Exception):
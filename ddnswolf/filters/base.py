@@ -1,6 +1,7 @@
 from abc import ABC
-from typing import Iterable
+from typing import Iterable, Dict, Type
 
+from ddnswolf import util
 from ddnswolf.models.address_provider import AddressProvider
 from ddnswolf.models.address_update import AddressUpdate
 
@@ -36,6 +37,16 @@ class AddressFilter(ABC):
     of the filter are anonymous.
     """
 
+    registry: Dict[str, Type["AddressFilter"]] = {}
+    """
+    All filter classes that have a config_type_name, by that name. Classes are added
+    when they are defined, so their modules must be imported before they can be found.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super(AddressFilter, cls).__init_subclass__(**kwargs)
+        util.register_type(AddressFilter.registry, cls, "filter")
+
     def __init__(self):
         super(AddressFilter, self).__init__()
 
@@ -46,6 +57,11 @@ class AddressFilter(ABC):
         filter class should perform the same filter operation each time, i.e. be
         idempotent.
 
+        Filters are chained, so both the input and the result may be lazy iterators
+        which can only be iterated once. Return a lazy result where possible, and only
+        collect the input into a list when the whole of it is needed, as for sorting.
+        The consumer at the end of the chain collects the final result.
+
         :abstract
         :param addresses: The input addresses.
         :return: The addresses after filtering.
@@ -74,6 +90,8 @@ class AddressFilterProxyProvider(AddressProvider):
     get the input for the filter.
     """
 
+    __slots__ = ("run_filter", "parent_source", "_filter", "_provide_parent")
+
     def __init__(self, run_filter: AddressFilter, parent_source: AddressProvider):
         """
         :param run_filter: The filter to apply to the addresses provided by the parent.
@@ -81,6 +99,10 @@ class AddressFilterProxyProvider(AddressProvider):
         """
         self.run_filter = run_filter
         self.parent_source = parent_source
+        # Bound once here, so that a chain of nested filters does not look up the
+        # methods again on every call.
+        self._filter = run_filter.filter
+        self._provide_parent = parent_source.provide_addresses
 
     def provide_addresses(self) -> Iterable[AddressUpdate]:
-        return self.run_filter.filter(self.parent_source.provide_addresses())
+        return self._filter(self._provide_parent())
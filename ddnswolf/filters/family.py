@@ -8,6 +8,16 @@ from ddnswolf.models.address_update import (
 )
 
 
+def _is_ipv4(a: AddressUpdate) -> bool:
+    # Exact type comparison, cheaper than isinstance. Address update types are not
+    # subclassed.
+    return type(a) is IPv4AddressUpdate
+
+
+def _is_ipv6(a: AddressUpdate) -> bool:
+    return type(a) is IPv6AddressUpdate
+
+
 class IPv4AddressFilter(AddressFilter):
     """Selects only IPv4 addresses."""
 
@@ -18,7 +28,7 @@ class IPv4AddressFilter(AddressFilter):
         Selects only IPv4 addresses. The relative ordering of the IPv4 addresses is left
         as-is.
         """
-        return filter(lambda a: isinstance(a, IPv4AddressUpdate), addresses)
+        return filter(_is_ipv4, addresses)
 
 
 class IPv6AddressFilter(AddressFilter):
@@ -31,4 +41,4 @@ class IPv6AddressFilter(AddressFilter):
         Selects only IPv6 addresses. The relative ordering of the IPv6 addresses is left
         as-is.
         """
-        return filter(lambda a: isinstance(a, IPv6AddressUpdate), addresses)
+        return filter(_is_ipv6, addresses)
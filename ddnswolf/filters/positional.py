@@ -1,3 +1,5 @@
+import collections
+import itertools
 from typing import Union, Iterable
 
 from ddnswolf.filters.base import AddressFilter
@@ -20,14 +22,19 @@ class NthAddressFilter(AddressFilter):
 
     def filter(self, addresses: Iterable[AddressUpdate]) -> Iterable[AddressUpdate]:
         """
-        Selects the address located at index. If there is no address at that index, an
-        empty list is returned.
+        Selects the address located at index. If there is no address at that index, the
+        result is empty.
+
+        For a non-negative index, returns a lazy iterator that reads the input only up to
+        that index. For a negative index, the whole input is read and a list of at most
+        one address is returned.
         """
-        try:
-            # Negative indices are handled nicely by the Python standard library.
-            return [list(addresses)[self.index]]
-        except IndexError:
-            return []
+        if self.index >= 0:
+            # Lazy, only consumes the input up to the requested index.
+            return itertools.islice(addresses, self.index, self.index + 1)
+        # Negative indices only need the last few addresses to be kept in memory.
+        tail = collections.deque(addresses, maxlen=-self.index)
+        return [tail[0]] if len(tail) == -self.index else []
 
 
 class FirstAddressFilter(AddressFilter):
@@ -37,10 +44,12 @@ class FirstAddressFilter(AddressFilter):
 
     def filter(self, addresses: Iterable[AddressUpdate]) -> Iterable[AddressUpdate]:
         """
-        Selects the first address in the list. If there are no addresses in the list, an
-        empty list is returned.
+        Selects the first address in the list. If there are no addresses in the list, the
+        result is empty.
+
+        Returns a lazy iterator that reads only the first address of the input.
         """
-        return addresses[0:1]
+        return itertools.islice(addresses, 1)
 
 
 class LastAddressFilter(AddressFilter):
@@ -50,7 +59,9 @@ class LastAddressFilter(AddressFilter):
 
     def filter(self, addresses: Iterable[AddressUpdate]) -> Iterable[AddressUpdate]:
         """
-        Selects the last address in the list. If there are no addresses in the list, an
-        empty list is returned.
+        Selects the last address in the list. If there are no addresses in the list, the
+        result is empty.
+
+        The whole input is read, and a list of at most one address is returned.
         """
-        return addresses[-1:]
+        return list(collections.deque(addresses, maxlen=1))
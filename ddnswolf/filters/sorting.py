@@ -8,6 +8,13 @@ from ddnswolf.models.address_update import (
 )
 
 
+_FAMILY_RANK = {IPv4AddressUpdate: 0, IPv6AddressUpdate: 1}
+"""
+Sort rank of each supported address family. Looked up by exact type, which avoids
+walking the class hierarchy for every address being sorted.
+"""
+
+
 class BinaryValueSortAddressFilter(AddressFilter):
     """
     Sorts addresses by their binary representation. Addresses with smaller binary values
@@ -25,12 +32,20 @@ class BinaryValueSortAddressFilter(AddressFilter):
 
         An empty input results in an empty output.
         """
+        addresses = addresses if isinstance(addresses, list) else list(addresses)
+        if len(addresses) < 2:
+            # Nothing to sort. Most interfaces only have one address.
+            return addresses
 
         def sort_key(a: AddressUpdate):
             # IPv4Address and IPv6 address are already comparable by their binary
             # representation. The first value in returned tuple will sort v4 address
             # before v6 addresses, and only compare addresses of the same version.
-            if isinstance(a, IPv4AddressUpdate):
+            rank = _FAMILY_RANK.get(type(a))
+            if rank is not None:
+                return rank, a.address
+            # Subclasses of the known address types are not in the table.
+            elif isinstance(a, IPv4AddressUpdate):
                 return 0, a.address
             elif isinstance(a, IPv6AddressUpdate):
                 return 1, a.address
@@ -1,11 +1,17 @@
 from typing import Iterable
 
 from ddnswolf.filters.base import AddressFilter
-from ddnswolf.models.address_update import (
-    AddressUpdate,
-    IPv4AddressUpdate,
-    IPv6AddressUpdate,
-)
+from ddnswolf.models.address_update import AddressUpdate, IP_ADDRESS_UPDATE_TYPES
+
+
+# ipaddress caches is_private and is_global for each address, and the same few
+# addresses are checked on every run.
+def _is_private(a: AddressUpdate) -> bool:
+    return isinstance(a, IP_ADDRESS_UPDATE_TYPES) and a.address.is_private
+
+
+def _is_global(a: AddressUpdate) -> bool:
+    return isinstance(a, IP_ADDRESS_UPDATE_TYPES) and a.address.is_global
 
 
 class PrivateAddressFilter(AddressFilter):
@@ -30,16 +36,7 @@ class PrivateAddressFilter(AddressFilter):
         The accuracy of this function depends on the implementation and recent updates
         of the official ipaddress module.
         """
-
-        def is_private(a):
-            if isinstance(a, IPv4AddressUpdate):
-                return a.address.is_private
-            elif isinstance(a, IPv6AddressUpdate):
-                return a.address.is_private
-            else:
-                return False
-
-        return filter(is_private, addresses)
+        return filter(_is_private, addresses)
 
 
 class PublicAddressFilter(AddressFilter):
@@ -56,7 +53,7 @@ class PublicAddressFilter(AddressFilter):
     def filter(self, addresses: Iterable[AddressUpdate]) -> Iterable[AddressUpdate]:
         """
         Selects public IPv4 or IPv6 addresses. Only addresses that are within the
-        specifically designated global Internet routable blocks are considered private.
+        specifically designated global Internet routable blocks are considered public.
         The relative ordering of addresses is preserved.
 
         Addresses that are not IPv4 or IPv6 are not included in the result.
@@ -64,13 +61,4 @@ class PublicAddressFilter(AddressFilter):
         The accuracy of this function depends on the implementation and recent updates
         of the official ipaddress module.
         """
-
-        def is_public(a):
-            if isinstance(a, IPv4AddressUpdate):
-                return a.address.is_global
-            elif isinstance(a, IPv6AddressUpdate):
-                return a.address.is_global
-            else:
-                return False
-
-        return filter(is_public, addresses)
+        return filter(_is_global, addresses)
@@ -1,9 +1,14 @@
+import functools
 import logging
 import importlib.resources
 import os.path
+import queue
 import time
-from datetime import timedelta, datetime
-from typing import List, Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from logging.handlers import QueueHandler, QueueListener
+from types import CodeType
+from typing import List, Callable, Dict, Type, Optional
 
 from pyhocon import ConfigFactory, ConfigTree, ConfigException
 
@@ -23,36 +28,118 @@ from ddnswolf.sources.base import AddressSource
 logger = logging.getLogger(None)
 
 
+@functools.lru_cache(maxsize=None)
+def _source_registry() -> Dict[str, Type[AddressSource]]:
+    """
+    Map of config type names to all known AddressSource classes. The source modules
+    are only imported on the first call, the registry is complete afterwards.
+    """
+    util.import_all_submodules("ddnswolf.sources")
+    return AddressSource.registry
+
+
+@functools.lru_cache(maxsize=None)
+def _updater_registry() -> Dict[str, Type[DNSUpdater]]:
+    """Map of config type names to all known DNSUpdater classes."""
+    util.import_all_submodules("ddnswolf.updaters")
+    return DNSUpdater.registry
+
+
+@functools.lru_cache(maxsize=None)
+def _filter_registry() -> Dict[str, Type[AddressFilter]]:
+    """Map of config type names to all known AddressFilter classes."""
+    util.import_all_submodules("ddnswolf.filters")
+    return AddressFilter.registry
+
+
+def _build_filter(filter_cls: Type[AddressFilter], *args) -> AddressProvider:
+    """
+    Construct a filter from a subscription string function call and bind it to its
+    parent provider.
+    """
+    # In the config, both the filter arguments and the parent source are all given
+    # together in one function call. But in our implementation we need to separate
+    # the filter args from the parent source.
+    parent_source = args[-1]
+    filter_args = args[0:-1]
+    # The filter args are given to the filter class as-is. It is not our job to
+    # validate the argument types. Essentially we provide a direct __init__ call from
+    # the config to the filter class.
+    # noinspection PyArgumentList
+    return filter_cls(*filter_args).as_provider(parent_source)
+
+
+@functools.lru_cache(maxsize=None)
+def _filter_eval_locals() -> Dict[str, Callable[..., AddressProvider]]:
+    """
+    The filter functions available when evaluating a subscription string, by filter
+    name. See DDNSWolfApplication.create_from_config() for how these are used. The
+    functions do not depend on the configuration, so they are only created once.
+    """
+    return {
+        filter_name: functools.partial(_build_filter, filter_cls)
+        for filter_name, filter_cls in _filter_registry().items()
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_subscription(subscription_str: str) -> CodeType:
+    """
+    Compile a subscription string to a code object for eval(). Identical subscription
+    strings, in one configuration or across reloads, share the same code object.
+    """
+    return compile(subscription_str, "<subscription>", "eval")
+
+
 class DDNSWolfApplication:
     def __init__(
         self,
         sources: List[AddressSource],
         updaters: List[DNSUpdater],
         check_interval: timedelta,
+        max_concurrent_updates: Optional[int] = None,
     ):
         self.sources = sources
         self.updaters = updaters
         self.check_interval = check_interval
         self.active = False
+        if max_concurrent_updates is None:
+            max_concurrent_updates = min(8, len(updaters) or 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_updates, thread_name_prefix="updater"
+        )
+        """
+        Runs the updaters. Updaters spend most of their time waiting on the network, so
+        running them concurrently shortens each check to the time of the slowest one.
+        Updaters must not share clients that are not thread-safe, such as the
+        python-cloudflare client.
+        """
 
     def run(self):
         self.active = True
-        last_update = datetime.min
+        # The monotonic clock is not affected by changes to the system time.
+        interval = self.check_interval.total_seconds()
+        next_update = time.monotonic()
         while self.active:
-            now = datetime.now()
-            if last_update + self.check_interval <= now:
+            now = time.monotonic()
+            if now >= next_update:
                 self.update_now()
-                last_update = now
+                next_update = now + interval
             else:
-                time.sleep(((last_update + self.check_interval) - now).total_seconds())
+                time.sleep(next_update - now)
 
     def update_now(self) -> None:
         """
-        Runs all updaters. Current implementation is to defer to
-        .update_from_subscriptions()
+        Runs all updaters concurrently, and waits for them to finish. Current
+        implementation is to defer to .update_from_subscriptions()
         """
-        for updater in self.updaters:
-            updater.update_from_subscriptions()
+        futures = [
+            self._executor.submit(updater.update_from_subscriptions)
+            for updater in self.updaters
+        ]
+        # Re-raise any exception from an updater, same as running them in order.
+        for future in futures:
+            future.result()
 
     @classmethod
     def create_from_config(
@@ -71,42 +158,46 @@ class DDNSWolfApplication:
 
         # Global options.
         check_interval = timedelta(seconds=config.get_int("check_interval_seconds"))
+        max_concurrent_updates = config.get_int("max_concurrent_updates", None)
+        if max_concurrent_updates is not None and max_concurrent_updates < 1:
+            raise DDNSWolfUserException(
+                f"The max_concurrent_updates option must be at least 1, it is "
+                f"{max_concurrent_updates}."
+            )
 
         # Load source objects.
-        util.import_all_submodules("ddnswolf.sources")
-        source_classes = {
-            source_cls.config_type_name: source_cls
-            for source_cls in util.find_all_subclasses(AddressSource)
-        }
-        sources = {}
+        # All source types are resolved before any source is created, so that a
+        # KeyError from within a source constructor is not reported as an unknown type.
+        source_classes = _source_registry()
+        source_entries = []
         for source_name, source_config in config.get_config("sources").items():
-            try:
-                source_type_name = source_config.get_string("type")
-                source_cls = source_classes[source_type_name]
-                sources[source_name] = source_cls(source_name, source_config)
-            except KeyError as ex:
-                # noinspection PyUnboundLocalVariable
+            source_type_name = source_config.get_string("type")
+            source_cls = source_classes.get(source_type_name)
+            if source_cls is None:
                 raise DDNSWolfUserException(
                     f"Could not find a source with the type {source_type_name}."
-                ) from ex
+                )
+            source_entries.append((source_name, source_cls, source_config))
+        sources = {
+            source_name: source_cls(source_name, source_config)
+            for source_name, source_cls, source_config in source_entries
+        }
 
         # Load updater objects.
-        util.import_all_submodules("ddnswolf.updaters")
-        updater_classes = {
-            updater_cls.config_type_name: updater_cls
-            for updater_cls in util.find_all_subclasses(DNSUpdater)
-        }
-        updaters: List[DNSUpdater] = []
+        updater_classes = _updater_registry()
+        updater_entries = []
         for updater_name, updater_config in config.get_config("updaters").items():
-            try:
-                updater_type_name = updater_config.get_string("type")
-                updater_cls = updater_classes[updater_type_name]
-                updaters.append(updater_cls(updater_name, updater_config))
-            except KeyError as ex:
-                # noinspection PyUnboundLocalVariable
+            updater_type_name = updater_config.get_string("type")
+            updater_cls = updater_classes.get(updater_type_name)
+            if updater_cls is None:
                 raise DDNSWolfUserException(
                     f"Could not find an updater with the name {updater_type_name}."
-                ) from ex
+                )
+            updater_entries.append((updater_name, updater_cls, updater_config))
+        updaters: List[DNSUpdater] = [
+            updater_cls(updater_name, updater_config)
+            for updater_name, updater_cls, updater_config in updater_entries
+        ]
 
         # Parse and connect updater subscriptions.
         #   "What the hell is this?" you may ask. This is an evil and amazing solution
@@ -127,40 +218,15 @@ class DDNSWolfApplication:
         # left as themselves because they are already providers.
         subscription_eval_locals = {}
         subscription_eval_locals.update(sources)
-        util.import_all_submodules("ddnswolf.filters")
-        for filter_cls in util.find_all_subclasses(AddressFilter):
-
-            def create_filter_local(
-                _filter_cls,
-            ) -> Callable[..., AddressProvider]:
-                def filter_local(*args):
-                    # In the config, both the filter arguments and the parent source
-                    # are all given together in one function call. But in our
-                    # implementation we need to separate the filter args from the
-                    # parent source.
-                    parent_source = args[-1]
-                    filter_args = args[0:-1]
-                    # The filter args are given to the filter class as-is. It is not
-                    # our job to validate the argument types. Essentially we provide
-                    # a direct __init__ call from the config to the filter class.
-                    # noinspection PyArgumentList
-                    return _filter_cls(*filter_args).as_provider(parent_source)
-
-                # This return is very important. A return statement is required to
-                # create a closure. Without this return and the surrounding
-                # create_filter_local() function, the surrounding local variables
-                # would not be cloned for each instance of the filter function.
-                return filter_local
-
-            subscription_eval_locals[filter_cls.config_type_name] = create_filter_local(
-                filter_cls
-            )
+        subscription_eval_locals.update(_filter_eval_locals())
 
         for updater in updaters:
             for subscription_str in updater.config.get_list("subscriptions"):
                 try:
                     computed_provider = eval(
-                        subscription_str, {}, subscription_eval_locals
+                        _compile_subscription(subscription_str),
+                        {},
+                        subscription_eval_locals,
                     )
                     updater.subscribe(computed_provider)
                 except NameError as ex:
@@ -168,7 +234,9 @@ class DDNSWolfApplication:
                         f"Unknown filter or source: {ex}"
                     ) from ex
 
-        return DDNSWolfApplication(list(sources.values()), updaters, check_interval)
+        return DDNSWolfApplication(
+            list(sources.values()), updaters, check_interval, max_concurrent_updates
+        )
 
     @staticmethod
     def read_config_file(config_path: str = None) -> ConfigTree:
@@ -180,7 +248,14 @@ class DDNSWolfApplication:
                 os.path.abspath(os.path.join(os.path.sep, "etc", "ddnswolf.conf")),
             ]
 
-        first_valid_path = next(filter(os.path.exists, try_paths), None)
+        first_valid_path = None
+        for try_path in try_paths:
+            try:
+                os.stat(try_path)
+            except OSError:
+                continue
+            first_valid_path = try_path
+            break
         if first_valid_path is None:
             raise DDNSWolfUserException(
                 f"Unable to find a configuration. Attempted paths: "
@@ -200,15 +275,37 @@ class DDNSWolfApplication:
         return config
 
 
+@functools.lru_cache(maxsize=None)
+def _logo() -> str:
+    """The startup logo. Only read from the package resources once."""
+    return importlib.resources.read_text("ddnswolf", "logo.txt", "utf-8")
+
+
+def _start_logging() -> QueueListener:
+    """
+    Configure logging for the application. Log records are passed through a queue to a
+    background thread that writes them, so that updaters never wait on the output.
+
+    :return: The listener writing the log output. Stop it to flush the remaining logs.
+    """
+    log_queue = queue.SimpleQueue()
+    output_handler = logging.StreamHandler()
+    output_handler.setFormatter(logging.Formatter("%(levelname)s/%(name)s %(message)s"))
+    queue_handler = QueueHandler(log_queue)
+    # The queue handler formats each record into its message before queueing it. Leave
+    # the message as it is, the output handler adds the level and name.
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    log_listener = QueueListener(log_queue, output_handler)
+    log_listener.start()
+    return log_listener
+
+
 def main():
+    log_listener = _start_logging()
     # noinspection PyBroadException
     try:
-        logging.basicConfig(
-            level=logging.INFO, format="%(levelname)s/%(name)s %(message)s"
-        )
-        logger.info(
-            "\n" + importlib.resources.read_text("ddnswolf", "logo.txt", "utf-8")
-        )
+        logger.info("\n" + _logo())
         logger.info(f"== DDNSWolf version {ddnswolf.version.get_full_version()} ==")
         app = DDNSWolfApplication.create_from_config()
         app.run()
@@ -219,6 +316,8 @@ def main():
         )
     except Exception as ex:
         log_exception(logger, ex)
+    finally:
+        log_listener.stop()
 
 
 if __name__ == "__main__":
@@ -16,6 +16,8 @@ class AddressProvider(ABC):
     checker, an address filter subscribing to another provider.
     """
 
+    __slots__ = ()
+
     def provide_addresses(self) -> Iterable[AddressUpdate]:
         """
         Get the current addresses represented by this provider. This call may involve a
@@ -15,6 +15,11 @@ class AddressUpdate:
     protocol file.
     """
 
+    # Address updates are created for every address on every check. Slots keep the
+    # instances small and attribute access fast. Subclasses should declare __slots__
+    # for their own fields.
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -23,27 +28,42 @@ class AddressUpdate:
 class IPv4AddressUpdate(AddressUpdate):
     """An update for an Internet Protocol version 4 address."""
 
+    __slots__ = ("address", "_address_text")
+
     rdtype = RdataType.A
+    """The DNS record type that represents this kind of address."""
+
+    rdtype_text = "A"
+    """The text form of rdtype, as used in zone files and most APIs."""
 
     def __init__(self, address: IPv4Address):
         super(IPv4AddressUpdate, self).__init__()
         self.address = address
-        """The DNS record type that represents this kind of address."""
+        self._address_text = None
 
+    @property
+    def address_text(self) -> str:
+        """The text form of the address, formatted once on first use."""
+        if self._address_text is None:
+            self._address_text = str(self.address)
+        return self._address_text
+
+    # Comparisons check the exact type of the other object rather than using
+    # isinstance(), these are called many times when sorting.
     def __eq__(self, other):
-        if isinstance(other, IPv4AddressUpdate):
+        if other.__class__ is IPv4AddressUpdate:
             return self.address == other.address
         return NotImplemented
 
     def __lt__(self, other):
-        if isinstance(other, IPv4AddressUpdate):
+        if other.__class__ is IPv4AddressUpdate:
             return self.address < other.address
-        elif isinstance(other, IPv4AddressUpdate):
-            return False
+        elif other.__class__ is IPv6AddressUpdate:
+            return True
         return NotImplemented
 
     def __str__(self):
-        return str(self.address)
+        return self.address_text
 
     def __repr__(self):
         return f"{type(self).__name__}({self.address!r})"
@@ -53,27 +73,44 @@ class IPv4AddressUpdate(AddressUpdate):
 class IPv6AddressUpdate(AddressUpdate):
     """An update for an Internet Protocol version 6 address."""
 
+    __slots__ = ("address", "_address_text")
+
     rdtype = RdataType.AAAA
+    """The DNS record type that represents this kind of address."""
+
+    rdtype_text = "AAAA"
+    """The text form of rdtype, as used in zone files and most APIs."""
 
     def __init__(self, address: IPv6Address):
         super(IPv6AddressUpdate, self).__init__()
         self.address = address
-        """The DNS record type that represents this kind of address."""
+        self._address_text = None
+
+    @property
+    def address_text(self) -> str:
+        """The text form of the address, formatted once on first use."""
+        if self._address_text is None:
+            self._address_text = str(self.address)
+        return self._address_text
 
     def __eq__(self, other):
-        if isinstance(other, IPv6AddressUpdate):
+        if other.__class__ is IPv6AddressUpdate:
             return self.address == other.address
         return NotImplemented
 
     def __lt__(self, other):
-        if isinstance(other, IPv6AddressUpdate):
+        if other.__class__ is IPv6AddressUpdate:
             return self.address < other.address
-        elif isinstance(other, IPv4AddressUpdate):
+        elif other.__class__ is IPv4AddressUpdate:
             return False
         return NotImplemented
 
     def __str__(self):
-        return str(self.address)
+        return self.address_text
 
     def __repr__(self):
         return f"{type(self).__name__}({self.address!r})"
+
+
+IP_ADDRESS_UPDATE_TYPES = (IPv4AddressUpdate, IPv6AddressUpdate)
+"""Address update types whose addresses are ipaddress objects."""
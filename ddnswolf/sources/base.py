@@ -1,7 +1,9 @@
 from abc import ABC
+from typing import Dict, Type
 
 from pyhocon import ConfigTree
 
+from ddnswolf import util
 from ddnswolf.models.address_provider import AddressProvider
 
 
@@ -26,6 +28,16 @@ class AddressSource(AddressProvider, ABC):
     refers to the custom identifier given to a particular instance of a source.
     """
 
+    registry: Dict[str, Type["AddressSource"]] = {}
+    """
+    Every concrete source class, keyed by its config_type_name. Filled in as each
+    subclass is defined. See AddressFilter.registry.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super(AddressSource, cls).__init_subclass__(**kwargs)
+        util.register_type(AddressSource.registry, cls, "source")
+
     def __init__(self, name: str, config: ConfigTree):
         super(AddressSource, self).__init__()
         self.name = name
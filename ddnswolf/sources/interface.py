@@ -3,6 +3,7 @@ from typing import Iterable
 
 import netifaces
 
+from ddnswolf import util
 from ddnswolf.exceptions import DDNSWolfUserException
 from ddnswolf.models.address_update import (
     AddressUpdate,
@@ -12,6 +13,16 @@ from ddnswolf.models.address_update import (
 from ddnswolf.sources.base import AddressSource
 
 
+_INTERFACE_CACHE_SECONDS = 5
+
+_interface_address_cache = util.TTLCache()
+"""
+Addresses of each interface by interface name, shared by all interface sources. Several
+subscriptions often read the same interface within one check, only the first one needs
+to ask the OS.
+"""
+
+
 class InterfaceAddressSource(AddressSource):
     """
     Provides addresses of local network interfaces. Interfaces can have any number of
@@ -28,6 +39,10 @@ class InterfaceAddressSource(AddressSource):
         super(InterfaceAddressSource, self).__init__(*args, **kwargs)
 
     def provide_addresses(self) -> Iterable[AddressUpdate]:
+        cached_addresses = _interface_address_cache.get(self.config["iface"])
+        if cached_addresses is not None:
+            return list(cached_addresses)
+
         if self.config["iface"] not in netifaces.interfaces():
             raise DDNSWolfUserException(
                 f"Interface {self.config['iface']} does not exist!"
@@ -53,9 +68,10 @@ class InterfaceAddressSource(AddressSource):
                     # scope ID attached. The IPv6 address model we use does not support
                     # this, we must manually strip it if present. An example of what we
                     # need to sanitize: 'fe80::547b:4b0:ac8c:61a3%wlp51s0'
-                    addr: str = address_data["addr"]
-                    if "%" in addr:
-                        addr = addr[0 : addr.find("%")]
+                    addr: str = address_data["addr"].partition("%")[0]
                     all_addresses.append(IPv6AddressUpdate(IPv6Address(addr)))
 
-        return all_addresses
+        _interface_address_cache.set(
+            self.config["iface"], all_addresses, _INTERFACE_CACHE_SECONDS
+        )
+        return list(all_addresses)
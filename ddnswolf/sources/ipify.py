@@ -1,9 +1,14 @@
+import atexit
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from ipaddress import IPv4Address, IPv6Address
-from typing import Iterable
+from typing import Iterable, Optional, Callable
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from ddnswolf import util
+from ddnswolf.exceptions import DDNSWolfUserException
 from ddnswolf.models.address_update import (
     AddressUpdate,
     IPv4AddressUpdate,
@@ -15,43 +20,110 @@ from ddnswolf.sources.base import AddressSource
 logger = logging.getLogger(__name__)
 
 
+_session = requests.Session()
+"""
+Shared by all ipify sources. Keeps the connections to ipify open between checks,
+avoiding a new TCP and TLS handshake for every request.
+"""
+_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+_session.headers["User-Agent"] = "DDNSWolf"
+atexit.register(_session.close)
+
+_REQUEST_TIMEOUT_SECONDS = (2.0, 5.0)
+"""Connect and read timeouts for requests to ipify."""
+
+_LAST_ADDRESS_CACHE_SECONDS = 900
+"""
+Default time to keep using the last address received from ipify, when it can not be
+reached. Three times the check interval of the example configuration, so that the last
+address is still known at the next check even when it runs a bit late.
+"""
+
+_last_addresses = util.TTLCache()
+"""
+The last address received from each ipify endpoint, by URL. Used when ipify can not be
+reached, so that a short outage does not remove the address from the update.
+"""
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ipify")
+"""Sends the IPv4 and IPv6 requests at the same time. Kept between checks."""
+
+
 class IPIfyAddressSource(AddressSource):
     """
     Obtains the public IP address of a host from the perspective of an external service.
     The service used is https://www.ipify.org/
 
-    This source has no configuration.
+    Configuration:
+        last_address_seconds: Optional. How long the last address received is used
+        when ipify can not be reached. Should be longer than check_interval_seconds.
+        Defaults to 900.
     """
 
     config_type_name = "ipify"
 
     def __init__(self, *args, **kwargs):
         super(IPIfyAddressSource, self).__init__(*args, **kwargs)
+        self.last_address_seconds = self.config.get_float(
+            "last_address_seconds", _LAST_ADDRESS_CACHE_SECONDS
+        )
+        if self.last_address_seconds < 0:
+            raise DDNSWolfUserException(
+                f"The last_address_seconds option of {self.name} must not be negative, "
+                f"it is {self.last_address_seconds}."
+            )
 
     def provide_addresses(self) -> Iterable[AddressUpdate]:
-        addresses = []
+        # The IPv4 and IPv6 lookups are independent, so they are sent at the same time.
+        address_v4 = _executor.submit(
+            self._get_address,
+            "https://api.ipify.org",
+            "IPv4",
+            lambda text: IPv4AddressUpdate(IPv4Address(text)),
+        )
+        address_v6 = _executor.submit(
+            self._get_address,
+            "https://api6.ipify.org",
+            "IPv6",
+            lambda text: IPv6AddressUpdate(IPv6Address(text)),
+        )
+        return [
+            address
+            for address in (address_v4.result(), address_v6.result())
+            if address is not None
+        ]
 
-        # IPv4
-        try:
-            response_v4 = requests.get("https://api.ipify.org")
-            if response_v4.status_code == 200:
-                address_v4 = IPv4AddressUpdate(IPv4Address(response_v4.text))
-                addresses.append(address_v4)
-                logger.info(f"IPv4 address received from ipify: {address_v4}.")
-            else:
-                logger.warning(f"Unexpected response from ipify IPv4: {response_v4}.")
-        except requests.exceptions.ConnectionError:
-            logger.warning("No IPv4 address received from ipify.")
-        # IPv6
+    def _get_address(
+        self, url: str, family_name: str, create_update: Callable[[str], AddressUpdate]
+    ) -> Optional[AddressUpdate]:
+        """
+        Ask one ipify endpoint for the address of one family. If ipify can not be
+        reached, the last address received from the endpoint within
+        last_address_seconds is returned instead.
+
+        :param url: The ipify endpoint for the address family.
+        :param family_name: Name of the address family, for log messages.
+        :param create_update: Creates an AddressUpdate from the response text.
+        :return: The address, or None if there is no address for this family.
+        """
         try:
-            response_v6 = requests.get("https://api6.ipify.org")
-            if response_v6.status_code == 200:
-                address_v6 = IPv6AddressUpdate(IPv6Address(response_v6.text))
-                addresses.append(address_v6)
-                logger.info(f"IPv6 address received from ipify: {address_v6}.")
+            response = _session.get(url, timeout=_REQUEST_TIMEOUT_SECONDS)
+            if response.status_code == 200:
+                address = create_update(response.text)
+                _last_addresses.set(url, address, self.last_address_seconds)
+                logger.info(f"{family_name} address received from ipify: {address}.")
+                return address
             else:
-                logger.warning(f"Unexpected response from ipify IPv6: {response_v6}.")
-        except requests.exceptions.ConnectionError:
-            logger.warning("No IPv6 address received from ipify.")
-
-        return addresses
+                logger.warning(
+                    f"Unexpected response from ipify {family_name}: {response}."
+                )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            address = _last_addresses.get(url)
+            if address is not None:
+                logger.warning(
+                    f"No {family_name} address received from ipify, using the last "
+                    f"known address {address}."
+                )
+                return address
+            logger.warning(f"No {family_name} address received from ipify.")
+        return None
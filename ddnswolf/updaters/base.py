@@ -1,23 +1,53 @@
-import ipaddress
-import itertools
 import logging
+import socket
 from abc import ABC
-from typing import Union, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Dict, Type
 
 from dns import resolver
+from dns.exception import DNSException
 from dns.rdataclass import RdataClass
+from dns.rdatatype import RdataType
 from pyhocon import ConfigTree
 
+from ddnswolf import util
 from ddnswolf.exceptions import DDNSWolfProgramException, log_exception
 from ddnswolf.models.address_provider import AddressProvider
 from ddnswolf.models.address_update import (
+    AddressUpdate,
     IPv4AddressUpdate,
     IPv6AddressUpdate,
+    IP_ADDRESS_UPDATE_TYPES,
 )
 
 logger = logging.getLogger(__name__)
 
 
+_RESOLVE_LIFETIME_SECONDS = 5.0
+"""
+Total time allowed for one DNS lookup in needs_update(), including retries across
+nameservers. Keeps one slow nameserver from holding up the whole update.
+"""
+
+_MAX_WORKERS_PER_UPDATER = 4
+"""
+Threads per updater, for reading subscriptions and processing address families at the
+same time. Extra work waits for a free thread.
+"""
+
+_ADDRESS_FAMILIES = {RdataType.A: socket.AF_INET, RdataType.AAAA: socket.AF_INET6}
+"""
+Socket address family of each address record type, for packing the text address in
+an answer to compare it with the packed form of an update.
+"""
+
+
+def _provide_address_list(provider: AddressProvider) -> List[AddressUpdate]:
+    # Filters may return lazy iterators. Consume them here, so that the work happens
+    # in the thread that called this.
+    return list(provider.provide_addresses())
+
+
 class DNSUpdater(ABC):
     """
     The base class for all updaters provided by DDNSWolf. An updater represents a
@@ -34,6 +64,23 @@ class DNSUpdater(ABC):
     refers to the custom identifier given to a particular instance of an updater.
     """
 
+    registry: Dict[str, Type["DNSUpdater"]] = {}
+    """
+    Every concrete updater class, keyed by its config_type_name. Filled in as each
+    subclass is defined. See AddressFilter.registry.
+    """
+
+    failed_lookup_retry_seconds: float = 60
+    """
+    After a lookup of the current record fails, the lookup is not attempted again for
+    this many seconds. Checks during that time fail immediately, which keeps an outage
+    from turning into a stream of retries against a rate-limited service.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super(DNSUpdater, cls).__init_subclass__(**kwargs)
+        util.register_type(DNSUpdater.registry, cls, "updater")
+
     def __init__(
         self, name: str, config: ConfigTree, subscriptions: List[AddressProvider] = None
     ):
@@ -54,6 +101,20 @@ class DNSUpdater(ABC):
         addresses they are interested in. Each updater stores a list of the providers
         from which they want to receive and possibly update addresses.
         """
+        self._executor = ThreadPoolExecutor(
+            max_workers=_MAX_WORKERS_PER_UPDATER, thread_name_prefix=name
+        )
+        """
+        Runs the concurrent parts of update_from_subscriptions(). The pool lives as long
+        as the updater, so its threads are reused from one update to the next. Tasks run
+        on it must not wait on other tasks of the same pool.
+        """
+        self._answer_cache = util.TTLCache()
+        """
+        DNS answers for the configured name by record type, kept for the TTL of the
+        answer. Failed lookups are kept for failed_lookup_retry_seconds. Used by the
+        default needs_update().
+        """
 
     def update(self, address_update) -> None:
         """
@@ -89,24 +150,56 @@ class DNSUpdater(ABC):
         :raises If it is unknown whether the address needs updating or not.
         """
 
-        if not isinstance(address_update, IPv4AddressUpdate) or isinstance(
-            address_update, IPv6AddressUpdate
-        ):
+        if not isinstance(address_update, IP_ADDRESS_UPDATE_TYPES):
             raise DDNSWolfProgramException(
                 f"Unsupported address update for {type(self).__name__}: "
                 f"{address_update}"
             )
 
-        # Use the system default resolver.
-        answers = resolver.resolve(
-            self.config["name"], address_update.rdtype, RdataClass.IN
-        )
+        answers = self._answer_cache.get(address_update.rdtype)
+        if answers is None:
+            try:
+                # Use the system default resolver.
+                answers = resolver.resolve(
+                    self.config["name"],
+                    address_update.rdtype,
+                    RdataClass.IN,
+                    lifetime=_RESOLVE_LIFETIME_SECONDS,
+                )
+            except DNSException as ex:
+                # Remember the failure, so that the lookup is not repeated right away.
+                self._answer_cache.set(
+                    address_update.rdtype, ex, self.failed_lookup_retry_seconds
+                )
+                raise
+            # The answer can not change in the DNS any sooner than its TTL.
+            self._answer_cache.set(address_update.rdtype, answers, answers.rrset.ttl)
+        elif isinstance(answers, DNSException):
+            raise self.recent_lookup_failure(answers)
         for answer in answers:
             if answer.rdtype == address_update.rdtype:
-                return ipaddress.ip_address(answer.address) != address_update.address
+                # Compare packed bytes, rather than creating an address object.
+                return (
+                    socket.inet_pton(_ADDRESS_FAMILIES[answer.rdtype], answer.address)
+                    != address_update.address.packed
+                )
         # Assume no RR of the correct type means it needs updating.
         return True
 
+    def recent_lookup_failure(self, cause: BaseException) -> DDNSWolfProgramException:
+        """
+        Create the exception to raise when a lookup is skipped because it failed less
+        than failed_lookup_retry_seconds ago.
+
+        :param cause: The exception from the failed lookup.
+        """
+        exception = DDNSWolfProgramException(
+            f"Lookup for {self.name} failed recently and will not be retried for up "
+            f"to {self.failed_lookup_retry_seconds} seconds: {cause}"
+        )
+        exception.__cause__ = cause
+        return exception
+
     def subscribe(self, provider: AddressProvider) -> None:
         """
         Subscribes this updater to the provider. No automatic processing becomes
@@ -128,48 +221,77 @@ class DNSUpdater(ABC):
         updater supports that, override this method and change the behavior. The cleanup
         process picks the first global address for each subclass of AddressUpdate. If
         there are no public addresses, then the first address of any kind is picked.
+
+        The addresses of different families are checked and updated at the same time,
+        so needs_update() and update() may run in several threads at once. Updaters
+        that use a client which is not thread-safe should give each thread its own.
         """
         logger.info(f"Starting update for {self.name}...")
 
-        all_addresses = list(
-            itertools.chain(*map(lambda p: p.provide_addresses(), self.subscriptions))
-        )
-        logger.info(
-            f"Addresses received from subscriptions: "
-            f"{', '.join(map(str, all_addresses))}."
-        )
+        if len(self.subscriptions) > 1:
+            # Subscriptions may each involve network requests or system calls. Ask
+            # them all at once, the results are still handled in subscription order.
+            provided_addresses = list(
+                self._executor.map(_provide_address_list, self.subscriptions)
+            )
+        else:
+            provided_addresses = map(_provide_address_list, self.subscriptions)
 
+        # Addresses are cleaned as they are received, in a single pass.
+        all_addresses = []
         cleaned_addresses = {}
-        for address in all_addresses:
-            # Only one address per type allowed.
-            if type(address) not in cleaned_addresses:
-                cleaned_addresses[type(address)] = address
-            # Prefer global addresses over non-global ones.
-            elif (
-                (
-                    isinstance(address, IPv4AddressUpdate)
-                    or isinstance(address, IPv6AddressUpdate)
-                )
-                and address.address.is_global
-                and not cleaned_addresses[type(address)].address.is_global
-            ):
-                cleaned_addresses[type(address)] = address
-        if sorted(all_addresses) != sorted(cleaned_addresses.values()):
+        for subscription_addresses in provided_addresses:
+            for address in subscription_addresses:
+                all_addresses.append(address)
+                address_type = type(address)
+                previous_address = cleaned_addresses.get(address_type)
+                # Only one address per type allowed.
+                if previous_address is None:
+                    cleaned_addresses[address_type] = address
+                # Prefer global addresses over non-global ones.
+                elif (
+                    address_type in IP_ADDRESS_UPDATE_TYPES
+                    and address.address.is_global
+                    and not previous_address.address.is_global
+                ):
+                    cleaned_addresses[address_type] = address
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Addresses received from subscriptions: "
+                f"{', '.join(map(str, all_addresses))}."
+            )
+
+        # Every address that was not kept is a duplicate within its family.
+        if len(all_addresses) != len(cleaned_addresses):
             logger.warning(
                 "Some addresses were removed, subscriptions provided multiple "
                 "within the same family."
             )
 
-        for address in cleaned_addresses.values():
-            # noinspection PyBroadException
-            try:
-                if self.needs_update(address):
-                    logger.info(f"Sending update for address {address}.")
-                    self.update(address)
-                else:
-                    logger.info(f"Update not needed for address {address}.")
-            except Exception as ex:
-                logger.warning(f"An error occurred while updating address {address}:")
-                log_exception(logger, ex)
+        if len(cleaned_addresses) > 1:
+            # Each address family is a separate record, with its own round trips to
+            # the service. Let them overlap rather than waiting for each in turn.
+            list(self._executor.map(self._update_address, cleaned_addresses.values()))
+        else:
+            for address in cleaned_addresses.values():
+                self._update_address(address)
 
         logger.info(f"Update finished for {self.name}.")
+
+    def _update_address(self, address) -> None:
+        """
+        Checks and, if needed, updates a single address. Errors are logged and not
+        raised, so that one failed address does not prevent updating the others.
+        """
+        # noinspection PyBroadException
+        try:
+            if self.needs_update(address):
+                logger.info(f"Sending update for address {address}.")
+                self.update(address)
+                # The cached answer is now out of date.
+                self._answer_cache.invalidate(address.rdtype)
+            else:
+                logger.info(f"Update not needed for address {address}.")
+        except Exception as ex:
+            logger.warning(f"An error occurred while updating address {address}:")
+            log_exception(logger, ex)
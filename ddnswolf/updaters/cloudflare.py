@@ -1,22 +1,173 @@
+import functools
+import hashlib
 import ipaddress
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Union, Optional
+import random
+import threading
+import time
+from typing import Union, Optional, Callable, Any, Dict
 
 import dns.name
+import requests
 from CloudFlare import CloudFlare
 from CloudFlare.exceptions import CloudFlareAPIError
-from dns.rdatatype import RdataType, UnknownRdatatype
 
 from ddnswolf import util
 from ddnswolf.exceptions import DDNSWolfUserException
-from ddnswolf.models.address_update import IPv4AddressUpdate, IPv6AddressUpdate
+from ddnswolf.models.address_update import (
+    IPv4AddressUpdate,
+    IPv6AddressUpdate,
+    IP_ADDRESS_UPDATE_TYPES,
+)
 from ddnswolf.updaters.base import DNSUpdater
 
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Optional, faster JSON encoder.
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+except ImportError:
+    _json_dumps = json.dumps
+
+
+_API_ATTEMPTS = 5
+"""Attempts for an API call that is rate limited or fails on the server side."""
+
+_API_BACKOFF_BASE_SECONDS = 0.5
+_API_BACKOFF_MAX_SECONDS = 8.0
+"""
+Retries wait a random time up to the base doubled for each attempt, capped at the
+maximum. The randomness spreads out the retries of updaters that failed together.
+"""
+
+_RETRYABLE_API_ERROR_CODES = frozenset({429, 971, 10013})
+"""Cloudflare error codes that mean the request was rate limited."""
+
+_STALE_ID_API_ERROR_CODES = frozenset({7000, 7003, 81044})
+"""
+Cloudflare error codes that mean a zone or record ID in the request does not exist.
+Other errors, including network failures (code 0), say nothing about the saved IDs.
+"""
+
+_AUTOMATIC_TTL_SECONDS = 300
+"""The TTL Cloudflare uses for records with the TTL set to automatic (1)."""
+
+_MISSING_RECORD_CACHE_SECONDS = 60
+"""How long to remember that a record does not exist."""
+
+_NOT_CACHED = object()
+
+_RDTYPES_BY_TEXT = {
+    update_type.rdtype_text: update_type.rdtype
+    for update_type in IP_ADDRESS_UPDATE_TYPES
+}
+"""Record types the updater handles, by their text form."""
+
+_ZONE_CACHE_SECONDS = 24 * 60 * 60
+"""
+How long to keep the zone details. Zones are found by a search that can take several
+API calls, and a zone ID does not change while the zone exists.
+"""
+
+
+def _is_retryable(ex: Exception) -> bool:
+    """Checks if a failed API call may succeed when tried again later."""
+    if isinstance(ex, CloudFlareAPIError):
+        return int(ex) in _RETRYABLE_API_ERROR_CODES
+    # The Cloudflare library passes server errors on as they are.
+    if isinstance(ex, requests.HTTPError):
+        return ex.response is not None and 500 <= ex.response.status_code < 600
+    return False
+
+
+def _call_api(api_method: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Make a Cloudflare API call, retrying with exponential backoff and jitter if it is
+    rate limited or fails on the server side. Other errors are raised right away.
+
+    :param api_method: The API method to call, args and kwargs are passed to it.
+    :return: The result of the API call.
+    """
+    for attempt in range(_API_ATTEMPTS):
+        try:
+            return api_method(*args, **kwargs)
+        except (CloudFlareAPIError, requests.HTTPError) as ex:
+            if attempt + 1 >= _API_ATTEMPTS or not _is_retryable(ex):
+                raise
+            delay = random.uniform(
+                0, min(_API_BACKOFF_MAX_SECONDS, _API_BACKOFF_BASE_SECONDS * 2**attempt)
+            )
+            logger.debug(f"Cloudflare API call failed, retry in {delay:.1f}s: {ex}")
+            time.sleep(delay)
+
+
+def _record_cache_seconds(record: Optional[dict]) -> float:
+    """How long to keep record details, or the absence of a record if None."""
+    if record is None:
+        return _MISSING_RECORD_CACHE_SECONDS
+    elif record["ttl"] == 1:
+        return _AUTOMATIC_TTL_SECONDS
+    else:
+        return record["ttl"]
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_address(
+    address_text: str,
+) -> Union[ipaddress.IPv4Address, ipaddress.IPv6Address]:
+    """
+    Parse the content of an address record. Record content only changes when it is
+    updated, so the same few strings are parsed on every check.
+    """
+    return ipaddress.ip_address(address_text)
+
+
+def _is_valid_saved_record(record: Any) -> bool:
+    """
+    Checks that a record read from a cache file has the fields the updater uses, so that
+    a damaged file is ignored rather than failing later.
+    """
+    if (
+        not isinstance(record, dict)
+        or not isinstance(record.get("id"), str)
+        or not isinstance(record.get("content"), str)
+        or not isinstance(record.get("ttl"), (int, float))
+        or isinstance(record["ttl"], bool)
+    ):
+        return False
+    try:
+        _parse_address(record["content"])
+    except ValueError:
+        return False
+    return True
+
+
+_thread_clients = threading.local()
+"""The API clients created in each thread, by access token. See _client_for()."""
+
+
+def _client_for(token: str) -> CloudFlare:
+    """
+    Get the calling thread's API client for an access token. The client rewrites its
+    shared request headers on every call, so it is not safe to use from several threads
+    at once. Within a thread, updaters with the same token share the client and its
+    HTTP session, so connections to the API are kept alive and reused across
+    hostnames and update checks.
+    """
+    clients = getattr(_thread_clients, "clients", None)
+    if clients is None:
+        clients = _thread_clients.clients = {}
+    client = clients.get(token)
+    if client is None:
+        client = clients[token] = CloudFlare(token=token, use_sessions=True)
+    return client
+
 
 class CloudflareDNSUpdater(DNSUpdater):
     """
@@ -35,39 +186,78 @@ class CloudflareDNSUpdater(DNSUpdater):
 
     def __init__(self, *args, **kwargs):
         super(CloudflareDNSUpdater, self).__init__(*args, **kwargs)
-        self.cf = CloudFlare(token=self.config["token"])
+        self._hostname = dns.name.from_text(self.config["hostname"])
+        """The configured hostname, parsed once for comparisons."""
+        self._hostname_key = self._hostname.to_text(omit_final_dot=True).lower()
+        """The configured hostname in the text form the API uses, for quick matching."""
+        self._new_record_template = {"name": self.config["hostname"], "ttl": 1}
+        """
+        Fields for creating the record that are the same for every address. TTL of 1
+        indicates automatic choice by CF.
+        """
         self._cf_zone = None
-        self._cf_zone_last_update = datetime.min
+        self._cf_zone_lock = threading.Lock()
+        """Held while searching for the zone, so that only one search runs at once."""
+        self._cf_zone_expires_at = 0.0
+        # Updaters for the same hostname may use different accounts, so the token is a
+        # part of the key for the saved files. Hashed, the token must not be readable
+        # from the file names.
+        cache_key = hashlib.sha256(
+            f"{self.config['token']}\n{self._hostname_key}".encode()
+        ).hexdigest()
+        self._cf_zone_file_name = f"cloudflare-zone-{cache_key}.json"
+        """Cache file for the zone details, so that they survive a restart."""
+        self._load_saved_zone()
+        self._record_cache = util.TTLCache()
+        self._written_records_file_name = f"cloudflare-records-{cache_key}.json"
+        """
+        Cache file for the records this updater wrote, by record type text, so that
+        the first check after a restart does not need to read them again.
+        """
+        self._written_records_lock = threading.Lock()
+        self._written_records = self._load_written_records()
+
+    @property
+    def cf(self) -> CloudFlare:
+        """
+        The API client for the calling thread, see _client_for(). Each thread has its
+        own client, so the address families updated at the same time really make their
+        calls at the same time.
+        """
+        return _client_for(self.config["token"])
 
     def update(self, address_update):
         cf_zone = self._get_zone()
         cf_record = self._get_record_for(address_update)
         if cf_record is not None:
             # Record exists. Overwrite its content with the new address.
-            self.cf.zones.dns_records.patch(
+            cf_record = self._call_records_api(
+                self.cf.zones.dns_records.patch,
                 cf_zone["id"],
                 cf_record["id"],
-                data=json.dumps({"content": str(address_update.address)}),
+                data=_json_dumps({"content": address_update.address_text}),
             )
-            # Update success! (API throws on error)
+            # Update success! (API throws on error) The response is the record as it
+            # now exists, so the next check does not need to fetch it again.
+            self._remember_written_record(address_update, cf_zone, cf_record)
         elif self.config.get("create_records", False):
-            # Record does not exist. Create it with sensible defaults. TTL of 1
-            # indicates automatic choice by CF.
-            self.cf.zones.dns_records.post(
+            # Record does not exist. Create it with sensible defaults.
+            cf_record = self._call_records_api(
+                self.cf.zones.dns_records.post,
                 cf_zone["id"],
-                data=json.dumps(
+                data=_json_dumps(
                     {
-                        "type": RdataType.to_text(address_update.rdtype),
-                        "name": self.config["hostname"],
-                        "content": str(address_update.address),
-                        "ttl": 1,
+                        **self._new_record_template,
+                        "type": address_update.rdtype_text,
+                        "content": address_update.address_text,
                     }
                 ),
             )
             # Update success! (API throws on error)
+            self._remember_written_record(address_update, cf_zone, cf_record)
             logger.info(
                 f"Created record "
-                f"{RdataType.to_text(address_update.rdtype)} {self.config['hostname']}"
+                f"{address_update.rdtype_text} {self.config['hostname']}"
             )
         else:
             raise DDNSWolfUserException(
@@ -80,70 +270,250 @@ class CloudflareDNSUpdater(DNSUpdater):
     ) -> bool:
         cf_record = self._get_record_for(address_update)
         if cf_record is not None:
-            return ipaddress.ip_address(cf_record["content"]) != address_update.address
+            return _parse_address(cf_record["content"]) != address_update.address
         # If no resource record is present, the address needs updating. The RR will be
         # created in update().
         return True
 
+    def _call_records_api(self, api_method: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Make a Cloudflare API call on the records of the zone, see _call_api(). If the
+        zone or record ID is not valid any more, the zone details are forgotten before
+        the error is raised.
+        """
+        try:
+            return _call_api(api_method, *args, **kwargs)
+        except CloudFlareAPIError as ex:
+            if int(ex) in _STALE_ID_API_ERROR_CODES:
+                # The zone may have been deleted, re-created or moved to another
+                # account. Find it again on the next check rather than trusting the
+                # saved zone ID until it expires.
+                self._forget_zone()
+            raise
+
     def _get_record_for(
         self, address_update: Union[IPv4AddressUpdate, IPv6AddressUpdate]
     ) -> Optional[dict]:
         """
         Get the record details for the configured name. May return None if no record
-        exists.
+        exists. May return a cached copy, which is kept for the TTL of the record.
+        """
+        record = self._record_cache.get(address_update.rdtype, _NOT_CACHED)
+        if isinstance(record, CloudFlareAPIError):
+            raise self.recent_lookup_failure(record)
+        elif record is not _NOT_CACHED:
+            return record
+
+        try:
+            record = self._fetch_record_for(address_update)
+        except CloudFlareAPIError as ex:
+            # Remember the failure, so that the lookup is not repeated right away.
+            self._record_cache.set(
+                address_update.rdtype, ex, self.failed_lookup_retry_seconds
+            )
+            raise
+        self._cache_record(address_update, record)
+        return record
+
+    def _cache_record(
+        self,
+        address_update: Union[IPv4AddressUpdate, IPv6AddressUpdate],
+        record: Optional[dict],
+    ) -> None:
         """
+        Remember the record details for the record type of the address, for the TTL of
+        the record. None records that the name has no record of that type.
+        """
+        self._record_cache.set(
+            address_update.rdtype, record, _record_cache_seconds(record)
+        )
+
+    def _remember_written_record(
+        self,
+        address_update: Union[IPv4AddressUpdate, IPv6AddressUpdate],
+        zone: dict,
+        record: dict,
+    ) -> None:
+        """
+        Cache a record that was just written, and save it for later runs until its TTL
+        runs out. The ID of the zone it was written in is saved with it.
+        """
+        self._cache_record(address_update, record)
+        entry = {
+            "zone_id": zone["id"],
+            "record": record,
+            "expires": time.time() + _record_cache_seconds(record),
+        }
+        with self._written_records_lock:
+            self._written_records[address_update.rdtype_text] = entry
+            try:
+                util.write_cache_file(
+                    self._written_records_file_name, self._written_records
+                )
+            except OSError as ex:
+                logger.warning(f"Could not save the records for {self.name}: {ex}")
+
+    def _load_written_records(self) -> Dict[str, dict]:
+        """
+        Restore the records saved by an earlier run into the record cache, for what
+        remains of their TTL. Only records in the saved zone are restored.
+
+        :return: The saved records that have not expired, by record type text.
+        """
+        saved = util.read_cache_file(self._written_records_file_name)
+        zone_id = self._cf_zone.get("id") if self._cf_zone is not None else None
+        if not isinstance(saved, dict) or zone_id is None:
+            return {}
+        written_records = {}
+        for rdtype_text, entry in saved.items():
+            rdtype = _RDTYPES_BY_TEXT.get(rdtype_text)
+            if (
+                rdtype is None
+                or not isinstance(entry, dict)
+                or not _is_valid_saved_record(entry.get("record"))
+                or not isinstance(entry.get("expires"), (int, float))
+                or entry.get("zone_id") != zone_id
+            ):
+                continue
+            remaining_seconds = entry["expires"] - time.time()
+            # A file from the future can not be trusted to expire.
+            if 0 < remaining_seconds <= _record_cache_seconds(entry["record"]):
+                self._record_cache.set(rdtype, entry["record"], remaining_seconds)
+                written_records[rdtype_text] = entry
+        return written_records
+
+    def _fetch_record_for(
+        self, address_update: Union[IPv4AddressUpdate, IPv6AddressUpdate]
+    ) -> Optional[dict]:
+        """Get the record details for the configured name from the API."""
         cf_zone = self._get_zone()
-        for record in self.cf.zones.dns_records.get(
-            cf_zone["id"], params={"name": self.config["hostname"]}
+        # Cloudflare filters the records by type, only records for this address
+        # family are returned.
+        for record in self._call_records_api(
+            self.cf.zones.dns_records.get,
+            cf_zone["id"],
+            params={
+                "name": self.config["hostname"],
+                "type": address_update.rdtype_text,
+            },
         ):
-            try:
-                if (
-                    util.dns_names_equal(record["name"], self.config["hostname"])
-                    and RdataType.from_text(record["type"]) == address_update.rdtype
-                ):
-                    return record
-            except UnknownRdatatype:
-                pass
+            # The API returns names without the final dot and in lowercase, so a plain
+            # string comparison almost always decides. Anything else, such as a name
+            # in its unicode form, is compared as a DNS name.
+            if record["name"].rstrip(".").lower() == self._hostname_key:
+                return record
+            if util.dns_names_equal(record["name"], self._hostname):
+                return record
         return None
 
     def _get_zone(self):
         """Get the zone details for the configured name. May return a cached copy."""
-        if (
-            self._cf_zone_last_update + timedelta(hours=4) > datetime.now()
-            and self._cf_zone is not None
-        ):
-            return self._cf_zone
+        cf_zone = self._cached_zone()
+        if cf_zone is not None:
+            return cf_zone
 
-        # Cloudflare's API requires a large-scope permission to be able to list *all*
-        # zones. This permission is not required if specifying the zone by name.
-        # Therefore, to avoid asking for that permission, an iterative search is
-        # performed to find the correct zone name.
-        zone_name = dns.name.from_text(self.config["hostname"])
-        while True:
-            try:
-                # Attempt to get the zone details.
-                for zone in self.cf.zones.get(params={"name": str(zone_name)}):
-                    if util.dns_names_equal(zone["name"], zone_name):
-                        # Found it!
-                        self._set_zone(zone)
-                        return self._cf_zone
-            except CloudFlareAPIError:
-                # The zone name we tried is not valid. Move to parent name.
-                pass
-            try:
+        with self._cf_zone_lock:
+            # Another thread may have found the zone while this one was waiting.
+            cf_zone = self._cached_zone()
+            if cf_zone is not None:
+                return cf_zone
+
+            # Cloudflare's API requires a large-scope permission to be able to list
+            # *all* zones. This permission is not required if specifying the zone by
+            # name. Therefore, to avoid asking for that permission, every parent name is
+            # tried to find the correct zone name, starting with the closest to the
+            # hostname. The names are tried one at a time, so the search stops at the
+            # first zone that is found. Top level domains are never zones that can be
+            # added to Cloudflare, so they are not tried.
+            zone_name = self._hostname
+            # Absolute names end in the empty root label, a TLD is two labels.
+            while len(zone_name.labels) > 2:
+                zone = self._find_zone(zone_name)
+                if zone is not None:
+                    # Found it!
+                    self._set_zone(zone)
+                    return self._cf_zone
                 zone_name = zone_name.parent()
-            except dns.name.NoParent as ex:
-                # No more names to check. Probably invalid configuration.
-                raise DDNSWolfUserException(
-                    f"Could not find the zone for {self.config['hostname']}. Either it "
-                    f"is the wrong name or the access token does not have sufficient "
-                    f"permissions to read the zone."
-                ) from ex
+            # No more names to check. Probably invalid configuration.
+            raise DDNSWolfUserException(
+                f"Could not find the zone for {self.config['hostname']}. Either it "
+                f"is the wrong name or the access token does not have sufficient "
+                f"permissions to read the zone."
+            )
+
+    def _cached_zone(self) -> Optional[dict]:
+        """Get the cached zone details, or None if there are none or they expired."""
+        if self._cf_zone is not None and time.monotonic() < self._cf_zone_expires_at:
+            return self._cf_zone
+        return None
+
+    def _find_zone(self, zone_name: dns.name.Name) -> Optional[dict]:
+        """
+        Get the zone details for a name, if that name is a zone. May return None if it
+        is not a zone, or the access token can not read it.
+        """
+        try:
+            for zone in _call_api(self.cf.zones.get, params={"name": str(zone_name)}):
+                if util.dns_names_equal(zone["name"], zone_name):
+                    return zone
+        except CloudFlareAPIError as ex:
+            if _is_retryable(ex):
+                # Still rate limited after retrying, that says nothing about the zone.
+                raise
+            # The zone name we tried is not valid.
+        return None
 
     def _set_zone(self, zone):
-        """Update the cache of the Cloudflare zone."""
+        """
+        Update the cache of the Cloudflare zone, and save it for later runs. None
+        removes the saved zone.
+        """
         self._cf_zone = zone
         if zone is not None:
-            self._cf_zone_last_update = datetime.now()
+            self._cf_zone_expires_at = time.monotonic() + _ZONE_CACHE_SECONDS
+            try:
+                # The monotonic clock does not carry over between runs, so the expiry
+                # is saved as wall clock time.
+                util.write_cache_file(
+                    self._cf_zone_file_name,
+                    {"zone": zone, "expires": time.time() + _ZONE_CACHE_SECONDS},
+                )
+            except OSError as ex:
+                logger.warning(f"Could not save the zone for {self.name}: {ex}")
         else:
-            self._cf_zone_last_update = datetime.min
+            self._cf_zone_expires_at = 0.0
+            try:
+                util.delete_cache_file(self._cf_zone_file_name)
+            except OSError as ex:
+                logger.warning(f"Could not remove the zone for {self.name}: {ex}")
+
+    def _forget_zone(self) -> None:
+        """
+        Drop the zone details, both cached and saved, along with the records found in
+        that zone.
+        """
+        with self._cf_zone_lock:
+            self._set_zone(None)
+        for rdtype in _RDTYPES_BY_TEXT.values():
+            self._record_cache.invalidate(rdtype)
+        with self._written_records_lock:
+            self._written_records.clear()
+            try:
+                util.delete_cache_file(self._written_records_file_name)
+            except OSError as ex:
+                logger.warning(f"Could not remove the records for {self.name}: {ex}")
+
+    def _load_saved_zone(self) -> None:
+        """Restore the zone details saved by an earlier run, if they have not expired."""
+        saved = util.read_cache_file(self._cf_zone_file_name)
+        if (
+            not isinstance(saved, dict)
+            or not isinstance(saved.get("zone"), dict)
+            or not isinstance(saved.get("expires"), (int, float))
+        ):
+            return
+        remaining_seconds = saved["expires"] - time.time()
+        # A file from the future can not be trusted to expire.
+        if 0 < remaining_seconds <= _ZONE_CACHE_SECONDS:
+            self._cf_zone = saved["zone"]
+            self._cf_zone_expires_at = time.monotonic() + remaining_seconds
@@ -1,31 +1,68 @@
+import functools
 import importlib
+import json
+import os
 import pkgutil
+import tempfile
+import threading
+import time
 from types import ModuleType
-from typing import Union, TypeVar, Type, Iterable
+from typing import Union, Hashable, Any, Dict, Tuple, Set, Type
 
 import dns.name
 from dns.name import Name
 
+from ddnswolf.exceptions import DDNSWolfProgramException
+
 
 def dns_names_equal(name1: Union[str, Name], name2: Union[str, Name]) -> bool:
     """
     Compare the equality of two domain names as defined by the DNS specification.
     Ignores case and root name at the end. Can be called with strings or a Name object.
     """
+    if isinstance(name1, str) and isinstance(name2, str):
+        # Names are most often given in the same plain form, a string comparison is
+        # enough to tell they are equal. Only parse them when it is not.
+        if _without_final_dot(name1).lower() == _without_final_dot(name2).lower():
+            return True
     if not isinstance(name1, Name):
-        name1 = dns.name.from_text(name1)
+        name1 = _name_from_text(name1)
     if not isinstance(name2, Name):
-        name2 = dns.name.from_text(name2)
+        name2 = _name_from_text(name2)
     return name1 == name2
 
 
+def _without_final_dot(text: str) -> str:
+    return text[:-1] if text.endswith(".") else text
+
+
+@functools.lru_cache(maxsize=1024)
+def _name_from_text(text: str) -> Name:
+    """
+    Cached dns.name.from_text(). The same names are compared over and over, and Name
+    objects are immutable, so they can be shared.
+    """
+    return dns.name.from_text(text)
+
+
+_imported_packages: Set[str] = set()
+"""Names of the packages that import_all_submodules() has already walked."""
+
+
 def import_all_submodules(parent_module: Union[str, ModuleType]) -> None:
     """
     Recursively imports all submodules of the given module. Ensures that all classes are
-    loaded, and all import-time code is executed. Required by find_all_subclasses() to
-    get accurate results.
+    loaded, and all import-time code is executed. Required for the class registries,
+    such as DNSUpdater.registry, to be complete.
     https://stackoverflow.com/a/25562415
+
+    Each package is only walked the first time, later calls return immediately.
     """
+    parent_name = (
+        parent_module if isinstance(parent_module, str) else parent_module.__name__
+    )
+    if parent_name in _imported_packages:
+        return
     if isinstance(parent_module, str):
         parent_module = importlib.import_module(parent_module)
     for loader, name, is_pkg in pkgutil.walk_packages(parent_module.__path__):
@@ -33,18 +70,129 @@ def import_all_submodules(parent_module: Union[str, ModuleType]) -> None:
         importlib.import_module(full_name)
         if is_pkg:
             import_all_submodules(full_name)
+    _imported_packages.add(parent_name)
+
+
+def register_type(registry: Dict[str, Type], cls: Type, kind: str) -> None:
+    """
+    Add a class to a plugin registry under its config_type_name, for use from
+    __init_subclass__(). Classes without a config_type_name are not added.
+
+    :param registry: The registry of the plugin base class, by config type name.
+    :param cls: The class being defined.
+    :param kind: What kind of plugin the registry holds, for the error message.
+    :raises DDNSWolfProgramException: If another class already has the same name.
+    """
+    if cls.config_type_name is NotImplemented:
+        return
+    if cls.config_type_name in registry:
+        raise DDNSWolfProgramException(
+            f"Duplicate {kind} type name {cls.config_type_name} in "
+            f"{cls.__qualname__} and {registry[cls.config_type_name].__qualname__}"
+        )
+    registry[cls.config_type_name] = cls
+
+
+class TTLCache:
+    """
+    A small thread-safe cache where every entry expires after its own lifetime. Expiry
+    uses the monotonic clock, so changes to the system time do not affect it.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        :return: The cached value for the key, or default if the key is not cached or
+                 its entry has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float) -> None:
+        """Cache a value for the key, replacing any previous entry."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove the entry for the key, if there is one."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def cache_directory() -> str:
+    """
+    The directory for files DDNSWolf keeps between runs to avoid repeating work. Uses
+    the directory given by systemd (CacheDirectory=) when run as a service, otherwise a
+    ddnswolf directory in the user's cache directory.
+    """
+    systemd_directory = os.environ.get("CACHE_DIRECTORY")
+    if systemd_directory:
+        # systemd gives a colon separated list when several directories are set.
+        return systemd_directory.split(":")[0]
+    user_cache_directory = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(user_cache_directory, "ddnswolf")
 
 
-C = TypeVar("C")
+def read_cache_file(name: str) -> Any:
+    """
+    Read a JSON value that was saved with write_cache_file(). Cache files are only an
+    optimization, so a missing or unreadable file is not an error.
+
+    :param name: The file name within the cache directory.
+    :return: The saved value, or None if there is none.
+    """
+    try:
+        with open(os.path.join(cache_directory(), name), "r") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
 
 
-def find_all_subclasses(parent_cls: Type[C]) -> Iterable[Type[C]]:
+def write_cache_file(name: str, value: Any) -> None:
+    """
+    Save a JSON value in the cache directory, creating the directory if needed. The
+    file is replaced atomically, so other processes reading it see either the old or the
+    new value, never a partial one.
+
+    :param name: The file name within the cache directory.
+    :param value: Any value that can be encoded as JSON.
+    :raises OSError: If the file can not be written.
     """
-    Recursively iterates through all subclasses of the given class. You should call
-    import_all_submodules() before this to ensure that all of the classes are actually
-    loaded.
-    https://stackoverflow.com/a/33607093
+    directory = cache_directory()
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{name}."
+    )
+    try:
+        with os.fdopen(file_descriptor, "w") as temporary_file:
+            json.dump(value, temporary_file)
+        os.replace(temporary_path, os.path.join(directory, name))
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def delete_cache_file(name: str) -> None:
+    """
+    Remove a file saved with write_cache_file(). A file that does not exist is not an
+    error.
+
+    :param name: The file name within the cache directory.
+    :raises OSError: If the file exists but can not be removed.
     """
-    for cls in parent_cls.__subclasses__():
-        yield from find_all_subclasses(cls)
-        yield cls
+    try:
+        os.unlink(os.path.join(cache_directory(), name))
+    except FileNotFoundError:
+        pass
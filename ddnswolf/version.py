@@ -5,14 +5,26 @@ either import it in another python module and call calculate_full_version() or r
 file as a script.
 """
 import logging
+import re
+import subprocess
 from abc import ABC
-from importlib.util import spec_from_loader, module_from_spec
-
-from git import InvalidGitRepositoryError
-from pkg_resources import parse_version
+from functools import cached_property, lru_cache
 
 logger = logging.getLogger(__name__)
 
+_VERSION_MODULE_PATH = "ddnswolf/version.py"
+"""
+Path of this module relative to the repo root, used to look up its history.
+"""
+
+_RELEASE_VERSION_PATTERN = re.compile(
+    rb"""^release_version\s*=\s*["'](.+?)["']""", re.MULTILINE
+)
+"""
+Extracts the release version from the source of a past copy of this module, without
+needing to execute it.
+"""
+
 
 release_version = "3"
 """
@@ -80,7 +92,9 @@ class VersionInfo(ABC):
         If the logic of this function is substantially modified, such as changing the
         path of the version module, the release version MUST be incremented. If it is
         not, this function cannot know if it is a primary release when one or more of
-        its parents are incompatible.
+        its parents are incompatible. Likewise, a release version must never return to
+        an earlier value, implementations only need to compare against the nearest
+        history.
 
         :return: True if the current commit is the first commit having its release
                  version.
@@ -118,47 +132,91 @@ class DynamicVersionInfo(VersionInfo):
         super(DynamicVersionInfo, self).__init__()
         # Deferred import to avoid importing a module that doesn't need to be present
         # in a deployed build.
-        from git import Repo
-
-        self.project_repo = Repo(path=None)
+        from git import GitCmdObjectDB, Repo
+
+        # Object reads go through the git binary rather than the pure python pack
+        # reader, and the repo must be the working directory itself. These are the
+        # GitPython defaults, pinned so that version calculation does not depend on
+        # them.
+        self.project_repo = Repo(
+            path=None, odbt=GitCmdObjectDB, search_parent_directories=False
+        )
+        # Every other calculation depends on this, and it requires a scan of the
+        # working tree. Do it exactly once.
+        self._is_snapshot = self._has_any_change()
 
     def is_snapshot_build(self) -> bool:
-        return self.project_repo.is_dirty(untracked_files=True)
+        return self._is_snapshot
+
+    def _has_any_change(self) -> bool:
+        """
+        Checks the working directory and index for any change from HEAD, including
+        untracked files. Rather than enumerating every change, git is stopped as soon
+        as it reports the first one.
+
+        :return: True if any change is present.
+        """
+        with subprocess.Popen(
+            ["git", "status", "--porcelain=v2", "-z", "--untracked-files=all"],
+            cwd=self.project_repo.working_tree_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as status_process:
+            first_byte = status_process.stdout.read(1)
+            status_process.kill()
+        return len(first_byte) > 0
 
     def get_build_number(self) -> int:
+        return self._build_number
+
+    def is_primary_release(self) -> bool:
+        return self._primary_release
+
+    @cached_property
+    def _build_number(self) -> int:
         return (
             # Bump for snapshot
             (1 if self.is_snapshot_build() else 0)
-            # Current commit
-            + 1
-            # All ancestors
-            + len(list(self.project_repo.head.commit.iter_parents()))
+            # Current commit and all ancestors
+            + int(self.project_repo.git.rev_list("--count", "HEAD"))
         )
 
-    def is_primary_release(self) -> bool:
+    @cached_property
+    def _primary_release(self) -> bool:
         if self.is_snapshot_build():
             # Treat snapshot builds as descending from HEAD
-            parent_commits = [self.project_repo.head.commit]
+            revisions = [self.project_repo.head.commit.hexsha]
         else:
-            parent_commits = self.project_repo.head.commit.iter_parents()
-
-        for parent_commit in parent_commits:
+            revisions = [
+                parent.hexsha for parent in self.project_repo.head.commit.parents
+            ]
+            if not revisions:
+                # The initial commit is always primary.
+                return True
+
+        # Deferred import, only needed when the version is calculated from the repo.
+        from packaging.version import Version
+
+        current_version = Version(release_version)
+        # Release versions are only ever incremented, so along any line of history the
+        # nearest commit decides: if it has a different release, so does everything
+        # before it. That is each parent itself, nothing further back needs reading.
+        for revision in revisions:
             try:
-                parent_version_module = module_from_spec(
-                    spec_from_loader(__name__ + "_dynamic", loader=None)
-                )
-                exec(
-                    parent_commit.tree["ddnswolf"]["version.py"].data_stream.read(),
-                    parent_version_module.__dict__,
+                # Read through the cat-file --batch process that GitPython keeps open,
+                # so every parent shares one git process.
+                _, _, _, blob_data = self.project_repo.git.get_object_data(
+                    f"{revision}:{_VERSION_MODULE_PATH}"
                 )
-                # noinspection PyUnresolvedReferences
-                if parse_version(
-                    parent_version_module.release_version
-                ) == parse_version(release_version):
-                    return False
-            except KeyError:
+            except ValueError:
                 # Parent does not have a version.py file, assume release is different.
-                pass
+                continue
+            version_match = _RELEASE_VERSION_PATTERN.search(blob_data)
+            if version_match is None:
+                # Parent has no recognizable release, assume release is different.
+                continue
+            if Version(version_match.group(1).decode()) == current_version:
+                return False
         return True
 
 
@@ -233,11 +291,14 @@ embedded_version_info = {repr(static)}
 """
 
 
+@lru_cache(maxsize=1)
 def get_full_version() -> str:
     """
     CALL THIS TO GET THE PROJECT VERSION. If a StaticVersionInfo object is present
     in ddnswolf.version_static, it will be used. Otherwise use DynamicVersionInfo. If
     the git module is not available, a SimpleVersionInfo object will be used.
+
+    The version is calculated once per process, later calls return the same result.
     """
     # Static version
     try:
@@ -245,13 +306,21 @@ def get_full_version() -> str:
 
         return version_static.embedded_version_info.get_full_version()
     except ImportError:
-        # Dynamic version
+        pass
+    # Dynamic version
+    try:
+        # Deferred import, git is not needed when a static version is present.
+        from git import InvalidGitRepositoryError
+
         try:
             return DynamicVersionInfo().get_full_version()
-        except (ImportError, InvalidGitRepositoryError):
-            # Empty version
-            logger.warning("DDNSWolf cannot calculate an accurate version number.")
-            return SimpleVersionInfo().get_full_version()
+        except InvalidGitRepositoryError:
+            pass
+    except ImportError:
+        pass
+    # Empty version
+    logger.warning("DDNSWolf cannot calculate an accurate version number.")
+    return SimpleVersionInfo().get_full_version()
 
 
 if __name__ == "__main__":
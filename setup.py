@@ -1,5 +1,5 @@
 #!/bin/env python3
-# Setuptools stub. See setup.cfg
+# Setuptools stub. See pyproject.toml
 
 import os.path
 import setuptools
@@ -24,7 +24,7 @@ class DDNSWolfBuildCommand(setuptools_build_py):
 
 
 setuptools.setup(
-    # setup.cfg does not support defining custom build steps.
+    # pyproject.toml does not support defining custom build steps.
     cmdclass={
         "build_py": DDNSWolfBuildCommand,
     },
@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from ipaddress import IPv4Address
+from unittest import mock
+
+from CloudFlare.exceptions import CloudFlareAPIError
+from pyhocon import ConfigFactory
+
+from ddnswolf import util
+from ddnswolf.models.address_update import IPv4AddressUpdate
+from ddnswolf.updaters import cloudflare
+
+
+class _FakeRecords:
+    def __init__(self):
+        self.error = None
+
+    def get(self, zone_id, params=None):
+        if self.error is not None:
+            raise self.error
+        return [
+            {
+                "id": "record",
+                "zone_id": zone_id,
+                "name": params["name"],
+                "type": params["type"],
+                "content": "192.0.2.1",
+                "ttl": 1,
+            }
+        ]
+
+    def patch(self, zone_id, record_id, data=None):
+        return {
+            "id": record_id,
+            "name": "a.example.com",
+            "type": "A",
+            "content": json.loads(data)["content"],
+            "ttl": 1,
+        }
+
+
+class _FakeZones:
+    def __init__(self):
+        self.dns_records = _FakeRecords()
+        self.searches = 0
+
+    def get(self, params=None):
+        self.searches += 1
+        if params["name"].rstrip(".") == "example.com":
+            return [{"id": "zone", "name": "example.com"}]
+        return []
+
+
+class _FakeClient:
+    def __init__(self, token=None, use_sessions=None):
+        self.zones = _FakeZones()
+
+
+class _CloudflareTestCase(unittest.TestCase):
+    def setUp(self):
+        cache_home = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_home.cleanup)
+        environment = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": cache_home.name})
+        environment.start()
+        self.addCleanup(environment.stop)
+        os.environ.pop("CACHE_DIRECTORY", None)
+        client = mock.patch.object(cloudflare, "CloudFlare", _FakeClient)
+        client.start()
+        self.addCleanup(client.stop)
+        # Clients are kept per thread and token, start each test with new ones.
+        clients = mock.patch.object(cloudflare, "_thread_clients", threading.local())
+        clients.start()
+        self.addCleanup(clients.stop)
+
+    def _make_updater(self, token: str = "token") -> cloudflare.CloudflareDNSUpdater:
+        return cloudflare.CloudflareDNSUpdater(
+            "test",
+            ConfigFactory.from_dict({"token": token, "hostname": "a.example.com"}),
+        )
+
+
+class CloudflareZoneCacheTest(_CloudflareTestCase):
+    def test_refused_record_call_forgets_zone(self):
+        updater = self._make_updater()
+        address = IPv4AddressUpdate(IPv4Address("192.0.2.1"))
+        self.assertFalse(updater.needs_update(address))
+        self.assertIsNotNone(util.read_cache_file(updater._cf_zone_file_name))
+
+        updater.cf.zones.dns_records.error = CloudFlareAPIError(7003, "No route")
+        updater._record_cache.invalidate(address.rdtype)
+        with self.assertRaises(CloudFlareAPIError):
+            updater.needs_update(address)
+        self.assertIsNone(updater._cached_zone())
+        self.assertIsNone(util.read_cache_file(updater._cf_zone_file_name))
+
+        # A new updater must search for the zone again, not load the old one.
+        updater.cf.zones.dns_records.error = None
+        searches = updater.cf.zones.searches
+        updater = self._make_updater()
+        self.assertIsNone(updater._cached_zone())
+        self.assertFalse(updater.needs_update(address))
+        self.assertGreater(updater.cf.zones.searches, searches)
+
+    def test_network_error_keeps_zone(self):
+        updater = self._make_updater()
+        address = IPv4AddressUpdate(IPv4Address("192.0.2.1"))
+        self.assertFalse(updater.needs_update(address))
+
+        updater.cf.zones.dns_records.error = CloudFlareAPIError(
+            0, "network exception - connection reset"
+        )
+        updater._record_cache.invalidate(address.rdtype)
+        with self.assertRaises(CloudFlareAPIError):
+            updater.needs_update(address)
+        self.assertIsNotNone(updater._cached_zone())
+        self.assertIsNotNone(util.read_cache_file(updater._cf_zone_file_name))
+
+
+class CloudflareWrittenRecordsTest(_CloudflareTestCase):
+    def test_written_records_are_restored(self):
+        address = IPv4AddressUpdate(IPv4Address("192.0.2.2"))
+        self._make_updater().update(address)
+
+        updater = self._make_updater()
+        updater.cf.zones.dns_records.error = CloudFlareAPIError(7003, "No route")
+        self.assertFalse(updater.needs_update(address))
+
+    def test_written_records_are_kept_per_token(self):
+        address = IPv4AddressUpdate(IPv4Address("192.0.2.2"))
+        self._make_updater().update(address)
+
+        # The other account's record is still the old address.
+        self.assertTrue(self._make_updater("other token").needs_update(address))
+
+    def test_malformed_written_records_are_ignored(self):
+        address = IPv4AddressUpdate(IPv4Address("192.0.2.2"))
+        updater = self._make_updater()
+        updater.update(address)
+        entry = util.read_cache_file(updater._written_records_file_name)["A"]
+        missing_ttl = {
+            key: value for key, value in entry["record"].items() if key != "ttl"
+        }
+        for record in (
+            missing_ttl,
+            {**entry["record"], "ttl": "1"},
+            {**entry["record"], "content": "nonsense"},
+            {**entry["record"], "id": None},
+        ):
+            util.write_cache_file(
+                updater._written_records_file_name, {"A": {**entry, "record": record}}
+            )
+            # The damaged record is not restored, it is read from the API instead.
+            self.assertTrue(self._make_updater().needs_update(address))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+
+import requests
+from pyhocon import ConfigFactory
+
+from ddnswolf import util
+from ddnswolf.sources import ipify
+
+
+class IPIfyLastAddressTest(unittest.TestCase):
+    def setUp(self):
+        last_addresses = mock.patch.object(ipify, "_last_addresses", util.TTLCache())
+        last_addresses.start()
+        self.addCleanup(last_addresses.stop)
+        self.now = 1000.0
+        clock = mock.patch.object(util.time, "monotonic", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    @staticmethod
+    def _respond(url, timeout=None):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"192.0.2.1" if "api6" not in url else b"2001:db8::1"
+        return response
+
+    @staticmethod
+    def _fail(url, timeout=None):
+        raise requests.exceptions.ConnectionError("unreachable")
+
+    def test_last_address_survives_one_check_interval(self):
+        source = ipify.IPIfyAddressSource("test", ConfigFactory.from_dict({}))
+        with mock.patch.object(ipify._session, "get", self._respond):
+            received = list(source.provide_addresses())
+
+        # The next check, one default check interval later and running a bit late.
+        self.now += 300 + 5
+        with mock.patch.object(ipify._session, "get", self._fail):
+            self.assertEqual(list(source.provide_addresses()), received)
+
+        self.now += source.last_address_seconds
+        with mock.patch.object(ipify._session, "get", self._fail):
+            self.assertEqual(list(source.provide_addresses()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
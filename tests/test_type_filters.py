@@ -0,0 +1,67 @@
+import unittest
+from ipaddress import IPv4Address, IPv4Network
+
+from ddnswolf.filters.type import PrivateAddressFilter, PublicAddressFilter
+from ddnswolf.models.address_update import IPv4AddressUpdate
+
+
+_SPECIAL_NETWORKS = (
+    "0.0.0.0/8",
+    "10.0.0.0/8",
+    "100.64.0.0/10",
+    "127.0.0.0/8",
+    "169.254.0.0/16",
+    "172.16.0.0/12",
+    "192.0.0.0/29",
+    "192.0.0.8/32",
+    "192.0.0.9/32",
+    "192.0.0.10/32",
+    "192.0.0.170/31",
+    "192.0.2.0/24",
+    "192.168.0.0/16",
+    "198.18.0.0/15",
+    "198.51.100.0/24",
+    "203.0.113.0/24",
+    "240.0.0.0/4",
+    "255.255.255.255/32",
+)
+"""IPv4 special-purpose blocks, including ones that differ between Python releases."""
+
+
+def _sample_addresses():
+    """
+    Every address of 192.0.0.0/24, where the private blocks have changed between Python
+    releases, and the edges of the special-purpose blocks.
+    """
+    addresses = set(IPv4Network("192.0.0.0/24"))
+    for network in map(IPv4Network, _SPECIAL_NETWORKS):
+        for edge in (int(network.network_address), int(network.broadcast_address)):
+            for offset in (-1, 0, 1):
+                if 0 <= edge + offset <= 0xFFFFFFFF:
+                    addresses.add(IPv4Address(edge + offset))
+    addresses.update(map(IPv4Address, ("8.8.8.8", "100.64.0.1", "1.1.1.1")))
+    return sorted(addresses)
+
+
+class PrivateAddressFilterTest(unittest.TestCase):
+    def test_matches_ipaddress(self):
+        addresses = _sample_addresses()
+        selected = PrivateAddressFilter().filter(map(IPv4AddressUpdate, addresses))
+        self.assertEqual(
+            [update.address for update in selected],
+            [address for address in addresses if address.is_private],
+        )
+
+
+class PublicAddressFilterTest(unittest.TestCase):
+    def test_matches_ipaddress(self):
+        addresses = _sample_addresses()
+        selected = PublicAddressFilter().filter(map(IPv4AddressUpdate, addresses))
+        self.assertEqual(
+            [update.address for update in selected],
+            [address for address in addresses if address.is_global],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()